@@ -1,83 +1,166 @@
 # app/api/endpoints/line_webhook.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import time
 
-from fastapi import APIRouter, Request, HTTPException
-from linebot.v3.webhook import WebhookHandler
-from linebot.v3.exceptions import InvalidSignatureError
+import aiohttp
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Request, Response, HTTPException
 from linebot.v3.messaging import (
-    ApiClient, # ApiClientを直接使うのではなく、Configuration経由で
-    Configuration, # Configuration をインポート
-    MessagingApi,
+    ApiException,
+    AsyncMessagingApi,
     ReplyMessageRequest,
     TextMessage as MessagingTextMessage
 )
-from linebot.v3.webhooks import (
-    MessageEvent,
-    TextMessageContent as WebhookTextMessageContent,
-)
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-handler = WebhookHandler(settings.LINE_CHANNEL_SECRET)
+# チャネルシークレットは不変なので、鍵を設定済みの HMAC を 1 度だけ作り、リクエストごとに copy() して使う
+_signature_mac = hmac.new(settings.LINE_CHANNEL_SECRET.encode("utf-8"), digestmod=hashlib.sha256)
+# X-Line-Signature は HMAC-SHA256 (32 バイト) を base64 にしたもので、常に 44 文字
+SIGNATURE_LENGTH = 44
+
+# プロセス全体で同時に処理するイベント数の上限。
+# 配信ごとではなく全 Webhook で共有し、バースト時も外部 API 呼び出しとメモリ使用量を一定に抑える
+# (LINE API のコネクションプールもこの値に合わせる。app/services/line_service.py を参照)
+MAX_CONCURRENT_EVENTS = settings.LINE_MAX_CONCURRENT_EVENTS
+_event_semaphore = asyncio.BoundedSemaphore(MAX_CONCURRENT_EVENTS)
+
+# 返信トークンの有効期限 (約 30 秒) に余裕を見た閾値。これより古いイベントには返信を試みない
+REPLY_TOKEN_MAX_AGE_MS = 25_000
+
+# Webhook ボディの上限。これを超える Content-Length は読み込む前に拒否する
+MAX_WEBHOOK_BODY_BYTES = 1024 * 1024
+
+# LINE のテキストメッセージは 5000 文字まで。エコー部分を切り詰めて上限内に収める
+MAX_REPLY_TEXT_LENGTH = 5000
+REPLY_PREFIX = "受け取ったメッセージ: "
+
+
+def verify_signature(body_bytes: bytes, signature: str) -> bool:
+    # 署名は生のリクエストボディ (bytes) に対して計算されるので、デコードせずにそのまま検証する
+    # 形式が不正な署名は HMAC を計算する前に弾く
+    # ヘッダー値は latin-1 でデコードされるため、非 ASCII 文字を含む str もここに届く
+    if len(signature) != SIGNATURE_LENGTH or not signature.isascii():
+        return False
+    try:
+        signature_digest = base64.b64decode(signature, validate=True)
+    except ValueError: # binascii.Error は ValueError のサブクラス
+        return False
+    if len(signature_digest) != _signature_mac.digest_size:
+        return False
+
+    mac = _signature_mac.copy()
+    mac.update(body_bytes)
+    # base64 へ再エンコードせず、32 バイトの生ダイジェスト同士を定数時間で比較する
+    return hmac.compare_digest(mac.digest(), signature_digest)
 
-# Messaging API のクライアントを設定 (修正箇所)
-# 1. Configurationオブジェクトを作成
-configuration = Configuration(
-    access_token=settings.LINE_CHANNEL_ACCESS_TOKEN
-)
 
-# 2. Configurationオブジェクトを使ってApiClientを初期化し、それをMessagingApiに渡す
-#    または、MessagingApiがConfigurationを直接受け取る場合もある
-#    以下のいずれかのパターンを試す
-# パターンA: MessagingApiがConfigurationオブジェクトを直接受け取る (推奨されることが多い)
-line_bot_api = MessagingApi(api_client=ApiClient(configuration)) # より明示的
-# または、よりシンプルにMessagingApiがConfigurationを直接受け取る場合:
-# line_bot_api = MessagingApi(configuration) # こちらも試す価値あり
+async def process_webhook_body(body_bytes: bytes, line_bot_api: AsyncMessagingApi):
+    # BackgroundTasks から呼ばれる (レスポンス返却後に実行される)
+    # 署名は callback で検証済みなので、ここではパースのみ行う
+    # SDK の Event モデルは組み立てず、必要なキーだけを dict のまま参照する
+    try:
+        events = orjson.loads(body_bytes)["events"]
+    except Exception:
+        logger.exception("Error parsing webhook body")
+        return
+
+    # イベントを直列に処理すると配信全体の所要時間が各イベントの合計になるため、並行して処理する
+    async def run_limited(event_handler, event: dict):
+        async with _event_semaphore:
+            await event_handler(event, line_bot_api)
+
+    tasks = []
+    for event in events:
+        if event.get("type") != "message":
+            continue
+        event_handler = MESSAGE_HANDLERS.get(event["message"].get("type"))
+        if event_handler is not None:
+            tasks.append(run_limited(event_handler, event))
 
-# (古いSDKや特定のバージョンでのApiClientの使い方だった場合、このブロックは不要)
-# configuration = ApiClient(access_token=settings.LINE_CHANNEL_ACCESS_TOKEN) # 元のコード
-# line_bot_api = MessagingApi(configuration) # 元のコード
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Error handling webhook event", exc_info=result)
 
 
 @router.post("/callback")
-async def callback(request: Request):
-    # ... (変更なし) ...
+async def callback(request: Request, background_tasks: BackgroundTasks):
     signature = request.headers.get("X-Line-Signature")
     if not signature:
         raise HTTPException(status_code=400, detail="X-Line-Signature header not found")
 
-    body_bytes = await request.body()
-    body = body_bytes.decode('utf-8')
+    # 不正に大きなリクエストは、Content-Length が申告されていればボディを読む前に弾く
+    content_length = request.headers.get("Content-Length")
+    # ヘッダー値は latin-1 でデコードされるので、"²" のような非 ASCII の数字は int() に渡さない
+    if (
+        content_length
+        and content_length.isascii()
+        and content_length.isdigit()
+        and int(content_length) > MAX_WEBHOOK_BODY_BYTES
+    ):
+        raise HTTPException(status_code=413, detail="Request body too large")
 
-    try:
-        print(f"Received body: {body}")
-        print(f"Received signature: {signature}")
-        handler.handle(body, signature)
-    except InvalidSignatureError:
-        print("Invalid signature. Please check your channel secret.")
+    # chunked 転送など Content-Length が無い場合も、読み込みながら上限を超えた時点で打ち切る
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_WEBHOOK_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Request body too large")
+    body_bytes = bytes(body)
+
+    # 署名検証だけはここで行い、イベント処理はレスポンス返却後に回す
+    # (検証前のボディはログにも出さない)
+    if not verify_signature(body_bytes, signature):
+        logger.warning("Invalid signature. Please check your channel secret.")
         raise HTTPException(status_code=400, detail="Invalid signature")
-    except Exception as e:
-        print(f"Error handling webhook: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
-    return "OK"
+    background_tasks.add_task(process_webhook_body, body_bytes, request.app.state.line_bot_api)
+    # LINE はステータスコードしか見ないので、ボディの JSON エンコードも省く
+    return Response(status_code=200)
+
+def build_text_reply(reply_token: str, text: str) -> ReplyMessageRequest:
+    # 返信トークンも本文もサーバー側で型が確定している str なので、Pydantic の検証を省いて組み立てる
+    return ReplyMessageRequest.construct(
+        reply_token=reply_token,
+        messages=[MessagingTextMessage.construct(text=text)],
+    )
 
-@handler.add(MessageEvent, message=WebhookTextMessageContent)
-def handle_text_message(event: MessageEvent):
-    # ... (変更なし) ...
-    print(f"Received text message event: {event}")
-    user_id = event.source.user_id
-    reply_token = event.reply_token
-    received_text = event.message.text if isinstance(event.message, WebhookTextMessageContent) else "Unknown text message format"
+
+async def handle_text_message(event: dict, line_bot_api: AsyncMessagingApi):
+    user_id = event["source"].get("userId")
+    reply_token = event["replyToken"]
+    received_text = event["message"]["text"]
+
+    # キュー滞留などで遅れて届いたイベントは返信トークンが失効しているので、API を呼ばずに終える
+    age_ms = int(time.time() * 1000) - event["timestamp"]
+    if age_ms > REPLY_TOKEN_MAX_AGE_MS:
+        logger.warning("Skipping reply to %s: event is %d ms old", user_id, age_ms)
+        return
+
+    # 受信テキスト自体が 5000 文字まであり得るので、連結後に測り直すのではなく先に上限で切る
+    reply_text = REPLY_PREFIX + received_text[:MAX_REPLY_TEXT_LENGTH - len(REPLY_PREFIX)]
 
     try:
-        line_bot_api.reply_message(
-            ReplyMessageRequest(
-                reply_token=reply_token,
-                messages=[MessagingTextMessage(text=f"受け取ったメッセージ: {received_text}")]
-            )
-        )
-        print(f"Replied to {user_id} with: {received_text}")
-    except Exception as e:
-        print(f"Error sending reply: {e}")
\ No newline at end of file
+        await line_bot_api.reply_message(build_text_reply(reply_token, reply_text))
+    except ApiException as e:
+        # 返信トークンの期限切れなど LINE API 側で弾かれるのは想定内なので、トレースバックは出さない
+        logger.warning("LINE API rejected reply to %s: status=%s body=%s", user_id, e.status, e.body)
+    except aiohttp.ClientError as e:
+        logger.warning("Network error sending reply to %s: %r", user_id, e)
+    except Exception:
+        logger.exception("Error sending reply to %s", user_id)
+
+
+# message.type -> ハンドラ。対応する種類を増やすときはここに追加する
+MESSAGE_HANDLERS = {
+    "text": handle_text_message,
+}
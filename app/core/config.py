@@ -1,23 +1,29 @@
 # app/core/config.py
+from pydantic import PositiveInt
 from pydantic_settings import BaseSettings
 import os
 from dotenv import load_dotenv
 
-# .envファイルが存在する場所からロード
+# .envファイルが存在する場所
 # プロジェクトルートにあることを想定
 # config.py が app/core/ にあるので、2階層上がる
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
-load_dotenv(dotenv_path=dotenv_path)
 # print(f"DEBUG: Loading .env from: {dotenv_path}") # デバッグ用
 # print(f"DEBUG: LINE_CHANNEL_ACCESS_TOKEN from env: {os.getenv('LINE_CHANNEL_ACCESS_TOKEN')}") # デバッグ用
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Default Project Name"
+    ENVIRONMENT: str = "local" # 本番では "production" 等を環境変数で渡す (.env を読まなくなる)
     API_V1_STR: str = "/api/v1"
+    LOG_LEVEL: str = "INFO" # ルートロガーのレベル (DEBUG / INFO / WARNING ...)
 
     # LINE
     LINE_CHANNEL_SECRET: str
     LINE_CHANNEL_ACCESS_TOKEN: str # <<<--- この行が正しく存在するか確認！型も str か確認！
+    # 同時に処理する Webhook イベント数の上限 (プロセス全体)。
+    # 各イベントは LINE API を同時に 1 本しか呼ばないので、api.line.me へのコネクションプール上限にも同じ値を使う
+    # 0 だとセマフォが永久に開かずイベントが一切処理されないので、1 以上を必須にする
+    LINE_MAX_CONCURRENT_EVENTS: PositiveInt = 8
 
     # Google
     # GOOGLE_APPLICATION_CREDENTIALS: Union[str, None] = None # pydantic v1 の書き方
@@ -33,5 +39,9 @@ class Settings(BaseSettings):
     #     env_file_encoding = 'utf-8'
     #     extra = 'ignore'
 
+# .env はローカル開発用。本番は環境変数がプラットフォームから渡されるので読み込まない
+if os.getenv("ENVIRONMENT", "local") == "local":
+    load_dotenv(dotenv_path=dotenv_path)
+
 settings = Settings()
 # print(f"DEBUG: Loaded Settings LINE_CHANNEL_ACCESS_TOKEN: {settings.LINE_CHANNEL_ACCESS_TOKEN if hasattr(settings, 'LINE_CHANNEL_ACCESS_TOKEN') else 'Not found'}") # デバッグ用
\ No newline at end of file
@@ -0,0 +1,29 @@
+# app/core/logging_config.py
+import logging
+import logging.handlers
+import queue
+
+
+def setup_logging(level: int | str = logging.INFO) -> logging.handlers.QueueListener:
+    """ルートロガーに QueueHandler を付け、実際の出力は QueueListener のスレッドで行う。
+
+    リクエスト処理側はキューにレコードを積むだけなので、stderr への書き込みで
+    イベントループがブロックされない。戻り値の listener はアプリ終了時に stop() すること。
+    """
+    log_queue: queue.Queue = queue.Queue(-1)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    )
+
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    return listener
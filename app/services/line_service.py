@@ -0,0 +1,40 @@
+# app/services/line_service.py
+import asyncio
+import logging
+
+from linebot.v3.messaging import (
+    AsyncApiClient,
+    AsyncMessagingApi,
+    Configuration,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 起動時のウォームアップに待つ最大秒数。SDK 既定の 300 秒待つと起動 (readiness) が止まってしまう
+WARM_UP_TIMEOUT_SECONDS = 3
+
+
+def create_line_bot_api() -> AsyncMessagingApi:
+    """Messaging API クライアントを生成する。main.py の lifespan から 1 度だけ呼ばれ、app.state に保持される。
+
+    非同期版 (aiohttp) を使い、返信中もイベントループを止めない。
+    aiohttp のセッションは実行中のイベントループ上で作る必要があるため、import 時ではなく起動時に生成する。
+    """
+    configuration = Configuration(
+        access_token=settings.LINE_CHANNEL_ACCESS_TOKEN
+    )
+    # 同時に走る API 呼び出しは Webhook のイベント処理の同時実行数 (セマフォ) が上限なので、プールも同じ大きさにする
+    # (小さいと返信が接続待ちで直列化し、大きくしても使われない)
+    configuration.connection_pool_maxsize = settings.LINE_MAX_CONCURRENT_EVENTS
+    return AsyncMessagingApi(AsyncApiClient(configuration))
+
+
+async def warm_up_line_bot_api(line_bot_api: AsyncMessagingApi):
+    # 起動時に一度 API を呼び、DNS 解決と TLS ハンドシェイクを済ませた接続をプールに残しておく
+    # 失敗やタイムアウトは起動を止めずに警告だけ出す (最初の返信が接続を張るだけ)
+    try:
+        await asyncio.wait_for(line_bot_api.get_bot_info(), timeout=WARM_UP_TIMEOUT_SECONDS)
+    except Exception:
+        logger.warning("Failed to warm up LINE Messaging API connection", exc_info=True)
@@ -1,16 +1,30 @@
+# main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from app.api.routers import api_router
-from app.core.config import settings
-
-app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
-
-# main.py (設定読み込み確認版)
-from fastapi import FastAPI
 # config.py から settings オブジェクトをインポート
 from app.core.config import settings # app/core/config.py が存在する必要あり
-
-app = FastAPI(title=settings.PROJECT_NAME) # タイトルを設定から取得
+from app.core.logging_config import setup_logging
+from app.services import line_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ログ出力はバックグラウンドスレッドに任せる
+    log_listener = setup_logging(settings.LOG_LEVEL)
+    # LINE のクライアントはイベントループ上で 1 度だけ作り、全リクエストで共有する
+    app.state.line_bot_api = line_service.create_line_bot_api()
+    await line_service.warm_up_line_bot_api(app.state.line_bot_api)
+    try:
+        yield
+    finally:
+        await app.state.line_bot_api.api_client.close()
+        log_listener.stop()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan, default_response_class=ORJSONResponse) # タイトルを設定から取得
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -0,0 +1,11 @@
+# tests/conftest.py
+import os
+
+# Settings() は import 時に必須項目を要求するので、テスト用の値を先に入れておく
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("LINE_CHANNEL_SECRET", "test_channel_secret")
+os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "test_access_token")
+os.environ.setdefault("GOOGLE_OAUTH_CLIENT_ID", "test_client_id")
+os.environ.setdefault("GOOGLE_OAUTH_CLIENT_SECRET", "test_client_secret")
+os.environ.setdefault("GOOGLE_OAUTH_REDIRECT_URI", "http://localhost/callback")
+os.environ.setdefault("GCP_PROJECT_ID", "test-project")
@@ -0,0 +1,11 @@
+# tests/test_config.py
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_settings_reject_non_positive_event_concurrency(monkeypatch):
+    monkeypatch.setenv("LINE_MAX_CONCURRENT_EVENTS", "0")
+    with pytest.raises(ValidationError):
+        Settings()
@@ -0,0 +1,27 @@
+# tests/test_line_service.py
+import asyncio
+
+from app.core.config import settings
+from app.services import line_service
+
+
+def test_warm_up_gives_up_after_timeout(monkeypatch):
+    class HangingApi:
+        async def get_bot_info(self):
+            await asyncio.sleep(3600)
+
+    monkeypatch.setattr(line_service, "WARM_UP_TIMEOUT_SECONDS", 0.01)
+
+    # ハングしても例外を投げずに戻り、起動を止めないこと
+    asyncio.run(asyncio.wait_for(line_service.warm_up_line_bot_api(HangingApi()), timeout=1))
+
+
+def test_connection_pool_matches_event_concurrency():
+    async def build():
+        line_bot_api = line_service.create_line_bot_api()
+        try:
+            return line_bot_api.api_client.configuration.connection_pool_maxsize
+        finally:
+            await line_bot_api.api_client.close()
+
+    assert asyncio.run(build()) == settings.LINE_MAX_CONCURRENT_EVENTS
@@ -0,0 +1,216 @@
+# tests/test_line_webhook.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import time
+
+import orjson
+from fastapi import FastAPI
+from linebot.v3.messaging import ReplyMessageRequest, TextMessage
+
+from app.api.endpoints import line_webhook
+from app.core.config import settings
+
+BODY = b'{"destination": "U0", "events": []}'
+
+
+class StubLineBotApi:
+    """reply_message の呼び出しを記録するだけの Messaging API のスタブ。"""
+
+    def __init__(self):
+        self.replies = []
+
+    async def reply_message(self, reply_message_request):
+        self.replies.append(reply_message_request)
+
+
+def text_event(text: str = "hello", *, age_ms: int = 0, reply_token: str = "reply-token") -> dict:
+    return {
+        "type": "message",
+        "replyToken": reply_token,
+        "source": {"type": "user", "userId": "U1234"},
+        "timestamp": int(time.time() * 1000) - age_ms,
+        "message": {"id": "1", "type": "text", "text": text},
+    }
+
+
+def process_events(events: list[dict], line_bot_api) -> None:
+    asyncio.run(line_webhook.process_webhook_body(orjson.dumps({"events": events}), line_bot_api))
+
+
+def sign(body: bytes) -> str:
+    digest = hmac.new(settings.LINE_CHANNEL_SECRET.encode("utf-8"), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def test_verify_signature_accepts_valid_signature():
+    assert line_webhook.verify_signature(BODY, sign(BODY))
+
+
+def test_verify_signature_rejects_tampered_body():
+    assert not line_webhook.verify_signature(BODY + b" ", sign(BODY))
+
+
+def test_verify_signature_rejects_wrong_length():
+    assert not line_webhook.verify_signature(BODY, sign(BODY)[:-1])
+    assert not line_webhook.verify_signature(BODY, sign(BODY) + "A")
+
+
+def test_verify_signature_rejects_non_ascii():
+    # Starlette はヘッダーを latin-1 でデコードするので、obs-text はこの形で届く
+    assert not line_webhook.verify_signature(BODY, "\xe9" * line_webhook.SIGNATURE_LENGTH)
+
+
+async def post_raw(app: FastAPI, chunks: list[bytes], headers: list[tuple[bytes, bytes]]) -> int:
+    # TestClient はヘッダー値を UTF-8 で再エンコードしてしまうので、生バイトのまま ASGI アプリを直接呼ぶ
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/callback",
+        "raw_path": b"/callback",
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(line_webhook.router)
+    return app
+
+
+def test_callback_returns_400_for_non_ascii_signature():
+    headers = [
+        (b"content-length", str(len(BODY)).encode("ascii")),
+        (b"x-line-signature", b"\xe9" * line_webhook.SIGNATURE_LENGTH),
+    ]
+    assert asyncio.run(post_raw(make_app(), [BODY], headers)) == 400
+
+
+def test_callback_ignores_non_ascii_content_length():
+    # "\xb2" は latin-1 で "²" になり、str.isdigit() が True を返す
+    headers = [
+        (b"content-length", b"\xb2"),
+        (b"x-line-signature", b"\xe9" * line_webhook.SIGNATURE_LENGTH),
+    ]
+    assert asyncio.run(post_raw(make_app(), [BODY], headers)) == 400
+
+
+def test_callback_returns_413_for_declared_oversized_body():
+    headers = [
+        (b"content-length", str(line_webhook.MAX_WEBHOOK_BODY_BYTES + 1).encode("ascii")),
+        (b"x-line-signature", sign(BODY).encode("ascii")),
+    ]
+    assert asyncio.run(post_raw(make_app(), [BODY], headers)) == 413
+
+
+def test_callback_returns_413_for_oversized_chunked_body():
+    # Content-Length の無い chunked 転送でも、読み込み中に上限で打ち切ること
+    chunk = b"x" * (64 * 1024)
+    chunks = [chunk] * (line_webhook.MAX_WEBHOOK_BODY_BYTES // len(chunk) + 1)
+    headers = [
+        (b"transfer-encoding", b"chunked"),
+        (b"x-line-signature", sign(BODY).encode("ascii")),
+    ]
+    assert asyncio.run(post_raw(make_app(), chunks, headers)) == 413
+
+
+def test_callback_accepts_valid_chunked_body():
+    app = make_app()
+    # events が空なのでクライアントは使われない
+    app.state.line_bot_api = None
+    half = len(BODY) // 2
+    headers = [
+        (b"transfer-encoding", b"chunked"),
+        (b"x-line-signature", sign(BODY).encode("ascii")),
+    ]
+    assert asyncio.run(post_raw(app, [BODY[:half], BODY[half:]], headers)) == 200
+
+
+def test_text_message_is_replied_to():
+    api = StubLineBotApi()
+    process_events([text_event("hello")], api)
+
+    assert len(api.replies) == 1
+    assert api.replies[0].reply_token == "reply-token"
+    assert api.replies[0].messages[0].text == line_webhook.REPLY_PREFIX + "hello"
+
+
+def test_event_older_than_reply_token_lifetime_is_skipped():
+    api = StubLineBotApi()
+    process_events([text_event(age_ms=line_webhook.REPLY_TOKEN_MAX_AGE_MS + 1000)], api)
+
+    assert api.replies == []
+
+
+def test_long_message_reply_fits_line_text_limit():
+    # LINE のテキストメッセージは受信側も 5000 文字まであり得る
+    api = StubLineBotApi()
+    process_events([text_event("あ" * 5000)], api)
+
+    reply_text = api.replies[0].messages[0].text
+    assert reply_text.startswith(line_webhook.REPLY_PREFIX)
+    assert len(reply_text) == line_webhook.MAX_REPLY_TEXT_LENGTH
+
+
+def test_non_text_and_non_message_events_are_ignored():
+    image_event = text_event()
+    image_event["message"] = {"id": "2", "type": "image"}
+    follow_event = {
+        "type": "follow",
+        "replyToken": "follow-token",
+        "source": {"type": "user", "userId": "U1234"},
+        "timestamp": int(time.time() * 1000),
+    }
+
+    api = StubLineBotApi()
+    process_events([image_event, follow_event], api)
+
+    assert api.replies == []
+
+
+def test_failing_handler_does_not_stop_other_events(monkeypatch):
+    handled = []
+
+    async def flaky_handler(event: dict, line_bot_api):
+        if event["message"]["text"] == "boom":
+            raise RuntimeError("handler failed")
+        handled.append(event["message"]["text"])
+
+    monkeypatch.setitem(line_webhook.MESSAGE_HANDLERS, "text", flaky_handler)
+
+    process_events([text_event("first"), text_event("boom"), text_event("last")], StubLineBotApi())
+
+    assert sorted(handled) == ["first", "last"]
+
+
+def test_build_text_reply_matches_validated_request():
+    # 検証を省いて組み立てても、SDK が送る JSON は通常の生成と同じであること
+    built = line_webhook.build_text_reply("reply-token", "こんにちは")
+    validated = ReplyMessageRequest(
+        reply_token="reply-token",
+        messages=[TextMessage(text="こんにちは")],
+    )
+
+    assert built.to_dict() == validated.to_dict()